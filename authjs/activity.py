@@ -0,0 +1,69 @@
+"""
+Buffered session activity tracking.
+
+Each worker keeps the last time every session token was seen in memory and
+periodically writes them to the storage engine in a single update.
+A timestamp only ever moves forward, both in the buffer and in the database.
+"""
+
+import logging
+import threading
+import time
+from datetime import UTC, datetime
+
+from authjs.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    def __init__(self, granularity: float = 60, flush_interval: float = 30) -> None:
+        self.granularity = granularity
+        self.flush_interval = flush_interval
+        self.pending: dict[str, datetime] = {}
+        self.flushed: dict[str, datetime] = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def _truncate(self, seen: datetime) -> datetime:
+        ts = seen.timestamp()
+        return datetime.fromtimestamp(ts - ts % self.granularity, tz=UTC)
+
+    def last_seen(self, token: str) -> datetime | None:
+        with self.lock:
+            return self.pending.get(token) or self.flushed.get(token)
+
+    def record(self, token: str, seen: datetime | None = None) -> None:
+        seen = self._truncate(seen or datetime.now(UTC))
+
+        with self.lock:
+            previous = self.pending.get(token) or self.flushed.get(token)
+            if previous is None or previous < seen:
+                self.pending[token] = seen
+
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+
+        if not batch:
+            return
+
+        try:
+            get_storage().touch_sessions(batch)
+        except Exception:
+            logger.exception(f"Could not flush activity of {len(batch)} sessions")
+            with self.lock:
+                for token, seen in batch.items():
+                    if token not in self.pending or self.pending[token] < seen:
+                        self.pending[token] = seen
+            return
+
+        with self.lock:
+            # keeping only the latest batch bounds memory, older tokens are in the database
+            self.flushed = batch
@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class AuthjsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authjs"
+
+    def ready(self) -> None:
+        from authjs import cache
+
+        user = self.get_model("User")
+        account = self.get_model("Account")
+        post_save.connect(cache.on_user_change, sender=user, dispatch_uid="authjs-user-save")
+        post_delete.connect(cache.on_user_change, sender=user, dispatch_uid="authjs-user-delete")
+        post_save.connect(
+            cache.on_account_change,
+            sender=account,
+            dispatch_uid="authjs-account-save",
+        )
+        post_delete.connect(
+            cache.on_account_change,
+            sender=account,
+            dispatch_uid="authjs-account-delete",
+        )
@@ -0,0 +1,229 @@
+"""
+Opt-in read-through cache for adapter user lookups.
+
+Enabled by pointing `AUTHJS_USER_CACHE` at a configured cache alias.
+Every user has a version counter; cached users are stored under a key
+that includes the version, so bumping the version on write makes every
+previously cached copy unreachable, even ones written by a reader that
+raced with the write.
+Email and account lookups only cache the user id and are always
+resolved through the versioned id entry.
+Writes inside a transaction invalidate again once it commits, readers in
+between still see the old row and may have cached it.
+ETags are derived from the version too, so conditional requests for cached
+users do not query the database.
+"""
+
+import hashlib
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+
+if TYPE_CHECKING:
+    from authjs.adapter import User
+
+PREFIX = "authjs"
+
+
+def get_cache() -> BaseCache | None:
+    alias = getattr(settings, "AUTHJS_USER_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def timeout() -> int | None:
+    return getattr(settings, "AUTHJS_USER_CACHE_TIMEOUT", 300)
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _version_key(user_id: str) -> str:
+    return f"{PREFIX}:user-version:{_hash(user_id)}"
+
+
+def _user_key(user_id: str, version: int) -> str:
+    return f"{PREFIX}:user:{_hash(user_id)}:{version}"
+
+
+def _email_key(email: str) -> str:
+    return f"{PREFIX}:user-email:{_hash(normalize_email(email))}"
+
+
+def _account_key(provider: str, provider_account_id: str) -> str:
+    return f"{PREFIX}:user-account:{_hash(f'{provider}\0{provider_account_id}')}"
+
+
+def _version(cache: BaseCache, user_id: str) -> int:
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # seeded from the clock so an evicted counter never reuses an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def _now_and_on_commit(invalidate: Callable[[], None]) -> None:
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+def _bump(cache: BaseCache, user_id: str) -> None:
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user(user_id: str | None) -> None:
+    cache = get_cache()
+    if cache is not None and user_id is not None:
+        _now_and_on_commit(lambda: _bump(cache, user_id))
+
+
+def invalidate_email(email: str | None) -> None:
+    cache = get_cache()
+    if cache is not None and email:
+        _now_and_on_commit(lambda: cache.delete(_email_key(email)))
+
+
+def invalidate_account(provider: str, provider_account_id: str) -> None:
+    cache = get_cache()
+    if cache is not None:
+        _now_and_on_commit(lambda: cache.delete(_account_key(provider, provider_account_id)))
+
+
+def _store_user(cache: BaseCache, version: int, user: "User") -> None:
+    if user["id"] is not None:
+        cache.set(_user_key(user["id"], version), user, timeout())
+
+
+def _get_indexed(
+    cache: BaseCache,
+    key: str,
+    user_id: str | None,
+    load: Callable[[], "User"],
+) -> "User":
+    if user_id is not None:
+        # the version is read before loading, a concurrent write makes the entry unreachable
+        version = _version(cache, user_id)
+        user = cache.get(_user_key(user_id, version))
+        if user is not None:
+            return user
+
+        user = load()
+        if user["id"] == user_id:
+            _store_user(cache, version, user)
+            return user
+    else:
+        user = load()
+
+    if user["id"] is not None:
+        cache.set(key, user["id"], timeout())
+    return user
+
+
+def get_user(user_id: str, load: Callable[[], "User"]) -> "User":
+    cache = get_cache()
+    if cache is None:
+        return load()
+
+    version = _version(cache, user_id)
+    user = cache.get(_user_key(user_id, version))
+    if user is None:
+        user = load()
+        _store_user(cache, version, user)
+    return user
+
+
+def get_user_by_email(email: str, load: Callable[[], "User"]) -> "User":
+    cache = get_cache()
+    if cache is None:
+        return load()
+
+    key = _email_key(email)
+    user = _get_indexed(cache, key, cache.get(key), load)
+    if user["email"] != email:
+        # emails are normalised for the key but matched exactly, like the query
+        return load()
+    return user
+
+
+def get_user_by_account(
+    provider: str,
+    provider_account_id: str,
+    user_id: str | None,
+    load: Callable[[], "User"],
+) -> "User":
+    cache = get_cache()
+    if cache is None:
+        return load()
+
+    key = _account_key(provider, provider_account_id)
+    cached_id = cache.get(key)
+    if cached_id is not None and cached_id != user_id:
+        return load()
+    return _get_indexed(cache, key, cached_id, load)
+
+
+def _etag(user_id: str, version: int) -> str:
+    # imported on use, this module is loaded with the app registry
+    from authjs.storage.base import etag
+
+    return etag("user", user_id, version)
+
+
+def user_etag(user_id: str | None) -> str | None:
+    """ETag from the user version, None when the cache is off."""
+    cache = get_cache()
+    if cache is None or user_id is None:
+        return None
+    return _etag(user_id, _version(cache, user_id))
+
+
+def user_by_email_etag(email: str | None) -> str | None:
+    """ETag from the version of the cached user holding the email, if any."""
+    cache = get_cache()
+    if cache is None or not email or (user_id := cache.get(_email_key(email))) is None:
+        return None
+
+    version = _version(cache, user_id)
+    user = cache.get(_user_key(user_id, version))
+    # the email entry may point at a user whose email changed since
+    if user is None or user["email"] != email:
+        return None
+    return _etag(user_id, version)
+
+
+def get_builtin_user_id(user_id: str, load: Callable[[], object]) -> object:
+    """Primary key of the builtin user linked to an authjs user."""
+    cache = get_cache()
+    if cache is None:
+        return load()
+
+    key = f"{PREFIX}:user-builtin:{_hash(user_id)}:{_version(cache, user_id)}"
+    pk = cache.get(key)
+    if pk is None:
+        pk = load()
+        cache.set(key, pk, timeout())
+    return pk
+
+
+def on_user_change(instance: Any, **_kwargs: Any) -> None:  # noqa: ANN401
+    invalidate_user(instance.pk)
+    invalidate_email(instance.email)
+
+
+def on_account_change(instance: Any, **_kwargs: Any) -> None:  # noqa: ANN401
+    invalidate_account(instance.provider, instance.provider_account_id)
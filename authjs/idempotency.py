@@ -0,0 +1,98 @@
+"""
+Idempotency keys for adapter write endpoints.
+
+Opt-in by pointing `AUTHJS_IDEMPOTENCY_CACHE` at a cache shared by every
+worker. A request carrying an `Idempotency-Key` header then runs once,
+successful responses are stored for `AUTHJS_IDEMPOTENCY_TIMEOUT` seconds and
+replayed to retries with the same key. Responses of sensitive routes carry
+credentials and are kept only for `SENSITIVE_TIMEOUT` seconds.
+Cache eviction bounds the number of stored responses.
+"""
+
+import hashlib
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http.request import HttpRequest
+from django.http.response import HttpResponse, JsonResponse
+
+HEADER = "Idempotency-Key"
+IN_PROGRESS = "in-progress"
+# in-progress markers expire early so a crashed worker does not block retries
+LOCK_TIMEOUT = 60
+# long enough for client retries, short enough not to keep tokens around
+SENSITIVE_TIMEOUT = 60
+
+
+def _key(name: str, request: HttpRequest, key: str) -> str:
+    digest = hashlib.sha256(
+        "\0".join([name, key, request.headers.get("Accept", "")]).encode(),
+    ).hexdigest()
+    return f"authjs:idempotency:{digest}"
+
+
+def _fingerprint(request: HttpRequest) -> str:
+    return hashlib.sha256(request.GET.urlencode().encode()).hexdigest()
+
+
+def _replay(stored: tuple, fingerprint: str) -> HttpResponse:
+    if stored[1] != fingerprint:
+        return JsonResponse(
+            {"errors": [f"{HEADER} was used with different parameters"]},
+            status=422,
+        )
+    if stored[0] == IN_PROGRESS:
+        return JsonResponse({"errors": ["Request is in progress"]}, status=409)
+
+    _, _, status, content, headers = stored
+    response = HttpResponse(content, status=status)
+    for header, value in headers:
+        response[header] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def run_once(
+    name: str,
+    request: HttpRequest,
+    view: Callable[[HttpRequest], HttpResponse],
+    *,
+    sensitive: bool = False,
+) -> HttpResponse:
+    alias = getattr(settings, "AUTHJS_IDEMPOTENCY_CACHE", None)
+    key = request.headers.get(HEADER)
+    if alias is None or not key:
+        return view(request)
+
+    cache = caches[alias]
+    cache_key = _key(name, request, key)
+    fingerprint = _fingerprint(request)
+    timeout = getattr(settings, "AUTHJS_IDEMPOTENCY_TIMEOUT", 60 * 60 * 24)
+    if sensitive:
+        timeout = min(timeout, SENSITIVE_TIMEOUT)
+
+    if not cache.add(cache_key, (IN_PROGRESS, fingerprint), LOCK_TIMEOUT):
+        stored = cache.get(cache_key)
+        return view(request) if stored is None else _replay(stored, fingerprint)
+
+    try:
+        response = view(request)
+    except BaseException:
+        cache.delete(cache_key)
+        raise
+
+    if response.status_code == 200:  # noqa: PLR2004
+        headers = [
+            (header, response[header])
+            for header in ("Content-Type", "Vary")
+            if response.has_header(header)
+        ]
+        cache.set(
+            cache_key,
+            ("done", fingerprint, response.status_code, response.content, headers),
+            timeout,
+        )
+    else:
+        cache.delete(cache_key)
+    return response
@@ -0,0 +1,123 @@
+"""
+Decryption of Auth.js JWT session cookies.
+https://authjs.dev/concepts/session-strategies#jwt-session
+
+Auth.js encrypts the session JWT as a compact JWE with direct key agreement,
+the key is derived from `AUTH_SECRET` with HKDF using the cookie name as salt.
+"""
+
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import os
+import struct
+import time
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+KEY_LENGTHS = {"A256CBC-HS512": 64, "A256GCM": 32}
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+@functools.lru_cache(maxsize=32)
+def derive_key(secret: str, salt: str, enc: str) -> bytes:
+    return HKDF(
+        algorithm=SHA256(),
+        length=KEY_LENGTHS[enc],
+        salt=salt.encode(),
+        info=f"Auth.js Generated Encryption Key ({salt})".encode(),
+    ).derive(secret.encode())
+
+
+def _cbc_hmac_tag(key: bytes, aad: bytes, iv: bytes, ciphertext: bytes) -> bytes:
+    al = struct.pack(">Q", len(aad) * 8)
+    return hmac.digest(key[:32], aad + iv + ciphertext + al, hashlib.sha512)[:32]
+
+
+def _decrypt(enc: str, key: bytes, segments: list[str]) -> bytes:
+    protected, _, iv_b64, ciphertext_b64, tag_b64 = segments
+    aad = protected.encode()
+    iv, ciphertext, tag = _b64decode(iv_b64), _b64decode(ciphertext_b64), _b64decode(tag_b64)
+
+    if enc == "A256GCM":
+        return AESGCM(key).decrypt(iv, ciphertext + tag, aad)
+
+    if not hmac.compare_digest(_cbc_hmac_tag(key, aad, iv, ciphertext), tag):
+        raise InvalidTokenError("Invalid authentication tag")  # noqa: EM101, TRY003
+
+    decryptor = Cipher(algorithms.AES(key[32:]), modes.CBC(iv)).decryptor()
+    padded = decryptor.update(ciphertext) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    return unpadder.update(padded) + unpadder.finalize()
+
+
+def decode(token: str, secrets: list[str], salt: str, leeway: int = 15) -> dict:
+    segments = token.split(".")
+    try:
+        protected, encrypted_key, _, _, _ = segments
+        header = json.loads(_b64decode(protected))
+    except ValueError as e:
+        raise InvalidTokenError("Malformed token") from e  # noqa: EM101, TRY003
+
+    enc = header.get("enc") if isinstance(header, dict) else None
+    if not isinstance(enc, str) or enc not in KEY_LENGTHS:
+        raise InvalidTokenError("Unsupported algorithm")  # noqa: EM101, TRY003
+    if header.get("alg") != "dir" or encrypted_key:
+        raise InvalidTokenError("Unsupported algorithm")  # noqa: EM101, TRY003
+
+    for secret in secrets:
+        try:
+            plaintext = _decrypt(enc, derive_key(secret, salt, enc), segments)
+            break
+        except Exception:  # noqa: BLE001, S112
+            continue
+    else:
+        raise InvalidTokenError("Could not decrypt token")  # noqa: EM101, TRY003
+
+    try:
+        claims = json.loads(plaintext)
+    except ValueError as e:
+        raise InvalidTokenError("Malformed claims") from e  # noqa: EM101, TRY003
+
+    exp = claims.get("exp") if isinstance(claims, dict) else None
+    if not isinstance(claims, dict) or not isinstance(exp, int | float | None):
+        raise InvalidTokenError("Malformed claims")  # noqa: EM101, TRY003
+    if exp is not None and exp + leeway < time.time():
+        raise InvalidTokenError("Token expired")  # noqa: EM101, TRY003
+
+    return claims
+
+
+def encode(claims: dict, secret: str, salt: str) -> str:
+    """Encrypts claims the way Auth.js does, mostly useful for tests."""
+    enc = "A256CBC-HS512"
+    key = derive_key(secret, salt, enc)
+    protected = _b64encode(json.dumps({"alg": "dir", "enc": enc}).encode()).encode()
+    iv = os.urandom(16)
+
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(json.dumps(claims).encode()) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key[32:]), modes.CBC(iv)).encryptor()
+    ciphertext = encryptor.update(padded) + encryptor.finalize()
+    tag = _cbc_hmac_tag(key, protected, iv, ciphertext)
+
+    return ".".join(
+        [protected.decode(), "", _b64encode(iv), _b64encode(ciphertext), _b64encode(tag)],
+    )
@@ -0,0 +1,208 @@
+"""
+Replays Auth.js adapter flows against a running server.
+
+    python manage.py authjs_loadtest http://127.0.0.1:8000/auth/ \
+        --concurrency 32 --flows 5000 --mix oauth=1,email=1,session=16,signout=1
+"""
+
+import asyncio
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from urllib.parse import urlencode, urljoin
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+FLOWS = ("oauth", "email", "session", "signout")
+
+
+def percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in FLOWS or not weight.isdigit():
+            raise CommandError(f"Invalid mix entry: {part}")  # noqa: TRY003, EM102
+        weights[name] = int(weight)
+    return weights
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, *, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+class Client:
+    def __init__(self, url: str, stats: Stats, executor: ThreadPoolExecutor) -> None:
+        self.url = url if url.endswith("/") else f"{url}/"
+        self.stats = stats
+        self.executor = executor
+
+    def _send(self, method: str, uri: str) -> int:
+        req = urllib.request.Request(uri, method=method)  # noqa: S310
+        try:
+            with urllib.request.urlopen(req) as res:  # noqa: S310
+                res.read()
+                return res.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    async def __call__(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict[str, Any],
+        expect: tuple[int, ...] = (200,),
+    ) -> bool:
+        query = urlencode(
+            {
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in params.items()
+                if value
+            },
+        )
+        uri = f"{urljoin(self.url, endpoint)}/?{query}"
+        loop = asyncio.get_running_loop()
+
+        start = time.perf_counter()
+        try:
+            status = await loop.run_in_executor(self.executor, self._send, method, uri)
+        except OSError:
+            status = 0
+        ok = status in expect
+        self.stats.record(endpoint, time.perf_counter() - start, ok=ok)
+        return ok
+
+
+class Flows:
+    """Request sequences Auth.js issues for each kind of interaction."""
+
+    def __init__(self, client: Client) -> None:
+        self.client = client
+        self.sessions: list[str] = []
+
+    def _user(self) -> dict[str, Any]:
+        uid = uuid.uuid4().hex
+        return {"id": uid, "email": f"{uid}@loadtest.invalid", "name": f"load {uid[:8]}"}
+
+    async def _sign_in(self, user: dict[str, Any]) -> None:
+        token = uuid.uuid4().hex
+        expires = datetime.now(UTC) + timedelta(days=30)
+        params = {"sessionToken": token, "userId": user["id"], "expires": expires}
+        if await self.client("POST", "create-session", params):
+            self.sessions.append(token)
+
+    async def oauth(self) -> None:
+        user = self._user()
+        account = {"provider": "loadtest", "providerAccountId": user["id"], "userId": user["id"]}
+        await self.client("GET", "get-user-by-account", account, (404,))
+        await self.client("GET", "get-user-by-email", {"email": user["email"]}, (404,))
+        await self.client("POST", "create-user", user)
+        await self.client(
+            "POST",
+            "link-account",
+            {**account, "type": "oauth", "access_token": uuid.uuid4().hex},
+        )
+        await self._sign_in(user)
+
+    async def email(self) -> None:
+        user = self._user()
+        token = {
+            "identifier": user["email"],
+            "token": uuid.uuid4().hex,
+            "expires": datetime.now(UTC) + timedelta(hours=1),
+        }
+        await self.client("GET", "get-user-by-email", {"email": user["email"]}, (404,))
+        await self.client("POST", "create-verification-token", token)
+        await self.client("DELETE", "use-verification-token", token)
+        await self.client("POST", "create-user", {**user, "emailVerified": token["expires"]})
+        await self._sign_in(user)
+
+    async def session(self) -> None:
+        if not self.sessions:
+            return await self.oauth()
+        token = random.choice(self.sessions)  # noqa: S311
+        await self.client("GET", "get-session-and-user", {"sessionToken": token}, (200, 404))
+        return None
+
+    async def signout(self) -> None:
+        if not self.sessions:
+            return await self.oauth()
+        token = self.sessions.pop(random.randrange(len(self.sessions)))  # noqa: S311
+        await self.client("DELETE", "delete-session", {"sessionToken": token})
+        return None
+
+
+async def run(url: str, concurrency: int, flows: int, mix: dict[str, int]) -> tuple[Stats, float]:
+    stats = Stats()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        runner = Flows(Client(url, stats, executor))
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        remaining = iter(range(flows))
+
+        async def worker() -> None:
+            for _ in remaining:
+                flow = random.choices(names, weights)[0]  # noqa: S311
+                await getattr(runner, flow)()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return stats, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = "Replay Auth.js adapter flows against a running server and report latencies"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("url", help="Adapter endpoint, e.g. http://127.0.0.1:8000/auth/")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--flows", type=int, default=1000, help="Total number of flows")
+        parser.add_argument(
+            "--mix",
+            default="oauth=1,email=1,session=16,signout=1",
+            help="Relative weights of oauth, email, session and signout flows",
+        )
+
+    def handle(self, *_args: Any, **options: Any) -> None:  # noqa: ANN401
+        mix = parse_mix(options["mix"])
+        stats, elapsed = asyncio.run(
+            run(options["url"], options["concurrency"], options["flows"], mix),
+        )
+
+        total = sum(len(samples) for samples in stats.latencies.values())
+        self.stdout.write(
+            f"{options['flows']} flows, {total} requests in {elapsed:.2f}s "
+            f"({total / elapsed:.1f} req/s)",
+        )
+        self.stdout.write(
+            f"{'endpoint':<28}{'count':>8}{'req/s':>10}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}",
+        )
+        for endpoint, samples in sorted(stats.latencies.items()):
+            self.stdout.write(
+                f"{endpoint:<28}{len(samples):>8}{len(samples) / elapsed:>10.1f}"
+                f"{percentile(samples, 50) * 1000:>10.2f}"
+                f"{percentile(samples, 95) * 1000:>10.2f}"
+                f"{percentile(samples, 99) * 1000:>10.2f}"
+                f"{stats.errors[endpoint] / len(samples):>9.1%}",
+            )
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from authjs.refresh import refresh_expiring
+
+
+class Command(BaseCommand):
+    help = "Refresh OAuth tokens of accounts before they expire"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--within",
+            type=int,
+            default=300,
+            help="Refresh tokens expiring within this many seconds",
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and poll every this many seconds",
+        )
+
+    def handle(self, *_args: Any, **options: Any) -> None:  # noqa: ANN401
+        while True:
+            refreshed, failed = refresh_expiring(
+                timedelta(seconds=options["within"]),
+                concurrency=options["concurrency"],
+                batch_size=options["batch_size"],
+            )
+            self.stdout.write(f"refreshed {refreshed} tokens, {failed} failed")
+
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
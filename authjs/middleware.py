@@ -1,22 +1,131 @@
-import contextlib
+import os
+import time
 from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING
 
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
 from django.utils.functional import SimpleLazyObject
 
-from authjs.models import Session
+from authjs.storage import get_storage
+from authjs.tracing import span
 
-TOKEN = getattr(settings, "AUTHJS_COOKIE_NAME", "authjs.session-token")
+if TYPE_CHECKING:
+    from authjs.storage.base import SessionRecord
+
+
+def cookie_name() -> str:
+    return getattr(settings, "AUTHJS_COOKIE_NAME", "authjs.session-token")
+
+
+def __getattr__(name: str) -> str:
+    # settings are read on use so importing does not require configured settings
+    if name == "TOKEN":
+        return cookie_name()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: EM102, TRY003
+
+
+def django_user(user_id: str, builtin_user_id: object = None) -> object:
+    return get_storage().get_django_user(user_id, builtin_user_id) or AnonymousUser()
 
 
 class AuthenticationMiddleware:
     def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
         self.get_response = get_response
+        self.token = cookie_name()
+        self.tracker = None
+        self.idle_timeout = None
+        self.shared = None
+        self.jwt = getattr(settings, "AUTHJS_SESSION_STRATEGY", "database") == "jwt"
+
+        if self.jwt:
+            from authjs import jwe
+
+            self.jwe = jwe
+            secret = getattr(settings, "AUTHJS_SECRET", None) or os.environ.get("AUTH_SECRET")
+            if not secret:
+                raise ImproperlyConfigured("AUTHJS_SECRET is required for jwt sessions")  # noqa: EM101, TRY003
+            self.secrets = [secret] if isinstance(secret, str) else list(secret)
+
+        if getattr(settings, "AUTHJS_ACTIVITY_TRACKING", False):
+            from authjs.activity import ActivityTracker
+
+            self.tracker = ActivityTracker(
+                granularity=getattr(settings, "AUTHJS_ACTIVITY_GRANULARITY", 60),
+                flush_interval=getattr(settings, "AUTHJS_ACTIVITY_FLUSH_INTERVAL", 30),
+            )
+
+        if (idle_timeout := getattr(settings, "AUTHJS_IDLE_TIMEOUT", None)) is not None:
+            if self.tracker is None:
+                raise ImproperlyConfigured(  # noqa: TRY003
+                    "AUTHJS_IDLE_TIMEOUT requires AUTHJS_ACTIVITY_TRACKING",  # noqa: EM101
+                )
+            self.idle_timeout = timedelta(seconds=idle_timeout)
+
+        if getattr(settings, "AUTHJS_SHARED_SESSION_CACHE", None):
+            from authjs import shm
+
+            self.shm = shm
+            self.shared = shm.get_cache()
+
+    def is_idle(self, session: "SessionRecord") -> bool:
+        if self.idle_timeout is None:
+            return False
+
+        seen = [session.last_seen]
+        if self.tracker is not None:
+            seen.append(self.tracker.last_seen(session.session_token))
+
+        last_seen = max((s for s in seen if s is not None), default=None)
+        return last_seen is not None and timezone.now() - last_seen > self.idle_timeout
+
+    def get_session(self, token: str, request: HttpRequest) -> "SessionRecord | None":
+        if self.shared is not None and (hit := self.shared.get(token)) is not None:
+            from authjs.storage.base import SessionRecord
+
+            user_id, builtin_user_id, valid_until = hit
+            expires = datetime.fromtimestamp(valid_until, UTC)
+            return SessionRecord(token, user_id, expires, builtin_user_id=builtin_user_id)
+
+        with span("authjs.middleware.session", request.headers):
+            session = get_storage().get_session(token)
+
+        if session is not None and self.shared is not None:
+            # idle sessions must not outlive their timeout in the cache
+            valid_until = min(session.expires.timestamp(), time.time() + self.shm.timeout())
+            if self.idle_timeout is not None and session.last_seen is not None:
+                valid_until = min(valid_until, (session.last_seen + self.idle_timeout).timestamp())
+            self.shared.set(token, session.user_id, valid_until, session.builtin_user_id)
+        return session
+
+    def jwt_session(self, request: HttpRequest) -> HttpResponse:
+        token = request.COOKIES.get(self.token)
+        if token is None:
+            # large tokens are split into numbered cookie chunks
+            chunks = []
+            while (chunk := request.COOKIES.get(f"{self.token}.{len(chunks)}")) is not None:
+                chunks.append(chunk)
+            token = "".join(chunks) or None
+
+        if token is None:
+            return self.get_response(request)
+
+        try:
+            claims = self.jwe.decode(token, self.secrets, self.token)
+        except self.jwe.InvalidTokenError:
+            return self.get_response(request)
+
+        if (sub := claims.get("sub")) and isinstance(sub, str):
+            setattr(request, "user", SimpleLazyObject(lambda: django_user(sub)))  # noqa: B010
+
+        return self.get_response(request)
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        token = request.COOKIES.get(TOKEN)
+        token = request.COOKIES.get(self.token)
 
         if not hasattr(request, "user"):
             raise ImproperlyConfigured(  # noqa: TRY003
@@ -25,12 +134,19 @@ class AuthenticationMiddleware:
                 "'authjs.middleware.AuthenticationMiddleware'",
             )
 
+        if self.jwt:
+            return self.jwt_session(request)
+
         if token is None:
             return self.get_response(request)
 
-        with contextlib.suppress(Session.DoesNotExist):
-            session = Session.objects.get(session_key=token)
-            setattr(request, "user", SimpleLazyObject(lambda: session.user.user))  # noqa: B010
+        session = self.get_session(token, request)
+        if session is None or self.is_idle(session):
             return self.get_response(request)
 
+        if self.tracker is not None:
+            self.tracker.record(token)
+
+        user = SimpleLazyObject(lambda: django_user(session.user_id, session.builtin_user_id))
+        setattr(request, "user", user)  # noqa: B010
         return self.get_response(request)
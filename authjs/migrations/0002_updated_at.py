@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authjs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="session",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authjs", "0002_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="account",
+            index=models.Index(fields=["expires_at"], name="authjs_account_expires_at"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authjs", "0003_account_expires_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="session",
+            name="last_seen",
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authjs", "0004_session_last_seen"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="refresh_failures",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="refresh_retry_at",
+            field=models.IntegerField(null=True),
+        ),
+    ]
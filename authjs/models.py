@@ -28,6 +28,7 @@ class User(m.Model):
     email = m.EmailField(unique=True, max_length=255, null=True)
     email_verified = m.DateTimeField(null=True)
     image = m.CharField(max_length=255, null=True)
+    updated_at = m.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name or self.email or self.id
@@ -52,9 +53,13 @@ class Account(m.Model):
     scope = m.CharField(max_length=255, null=True)
     id_token = m.TextField(null=True)
     session_state = m.CharField(max_length=255, null=True)
+    # token refresh bookkeeping, see authjs.refresh
+    refresh_failures = m.PositiveIntegerField(default=0)
+    refresh_retry_at = m.IntegerField(null=True)
 
     class Meta:
         unique_together = ("provider", "provider_account_id")
+        indexes = (m.Index(fields=["expires_at"], name="authjs_account_expires_at"),)
 
     def __str__(self) -> str:
         return f"{self.user}@{self.provider}"
@@ -68,6 +73,8 @@ class Session(session.Session):
         on_delete=m.DO_NOTHING,
         db_column="user",
     )
+    updated_at = m.DateTimeField(auto_now=True)
+    last_seen = m.DateTimeField(null=True)
 
     @property
     def user(self) -> User:
@@ -0,0 +1,27 @@
+"""
+Column projections read through `values_list`, lookups return the selected
+columns as a tuple without instantiating models.
+"""
+
+from typing import Any
+
+from django.db.models import Model
+
+
+class Projection:
+    def __init__(
+        self,
+        model: type[Model],
+        fields: tuple[str, ...],
+        lookups: tuple[str, ...],
+    ) -> None:
+        self.model = model
+        self.fields = fields
+        self.lookups = lookups
+
+    def get(self, *values: Any) -> tuple:  # noqa: ANN401
+        return (
+            self.model._default_manager.filter(**dict(zip(self.lookups, values, strict=True)))  # noqa: SLF001
+            .values_list(*self.fields)
+            .get()
+        )
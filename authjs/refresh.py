@@ -0,0 +1,173 @@
+"""
+Proactive OAuth token refresh for `authjs.Account` rows.
+
+Refresh callables are configured per provider with dotted paths:
+
+    AUTHJS_TOKEN_REFRESHERS = {"google": "myapp.tokens.refresh_google"}
+
+A refresher receives the account and returns the token fields that changed,
+e.g. `{"access_token": ..., "expires_at": ...}`. A result without `expires_at`
+stores the new access token as never expiring, like OAuth responses without
+`expires_in`, so it is not refreshed again on every run.
+
+Accounts are claimed before they are refreshed by moving `refresh_retry_at`
+past the lease, so concurrent workers never refresh the same account, which
+would invalidate rotated refresh tokens. Failed refreshes are retried with
+exponential backoff so they do not hold the head of the queue, accounts that
+already expired are given up after `MAX_FAILURES`. Results are written only
+when the tokens that were read are still current.
+"""
+
+import json
+import logging
+import time
+import urllib.request
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.utils.module_loading import import_string
+
+import authjs.models as m
+from authjs.adapter import Account
+
+logger = logging.getLogger(__name__)
+
+Refresher = Callable[[Account], dict]
+
+FIELDS = ("access_token", "token_type", "id_token", "refresh_token", "scope", "expires_at")
+# seconds a claimed account is left to the worker that claimed it
+LEASE = 600
+MAX_FAILURES = 5
+MAX_BACKOFF = 3600
+
+
+def refreshers() -> dict[str, Refresher]:
+    return {
+        provider: import_string(path) if isinstance(path, str) else path
+        for provider, path in getattr(settings, "AUTHJS_TOKEN_REFRESHERS", {}).items()
+    }
+
+
+def _due(now: int) -> Q:
+    return Q(refresh_retry_at__isnull=True) | Q(refresh_retry_at__lte=now)
+
+
+def expiring_accounts(within: timedelta, providers: Iterable[str]) -> QuerySet[m.Account]:
+    now = int(time.time())
+    return (
+        m.Account.objects.filter(
+            _due(now),
+            provider__in=list(providers),
+            expires_at__lte=now + int(within.total_seconds()),
+        )
+        .exclude(refresh_token=None)
+        .exclude(refresh_token="")
+        .exclude(refresh_failures__gte=MAX_FAILURES, expires_at__lt=now)
+        .order_by("expires_at")
+    )
+
+
+def claim(within: timedelta, providers: Iterable[str], batch_size: int) -> list[m.Account]:
+    """Leases up to `batch_size` expiring accounts to the calling worker."""
+    now = int(time.time())
+    with transaction.atomic():
+        candidates = list(
+            expiring_accounts(within, providers).select_for_update(skip_locked=True)[:batch_size],
+        )
+        # conditional so backends without row locks cannot claim an account twice
+        return [
+            acc
+            for acc in candidates
+            if m.Account.objects.filter(_due(now), pk=acc.pk).update(refresh_retry_at=now + LEASE)
+        ]
+
+
+def oauth2_refresher(token_url: str, client_id: str, client_secret: str) -> Refresher:
+    """Refresher for providers implementing the standard refresh_token grant."""
+
+    def refresh(account: Account) -> dict:
+        body = urlencode(
+            {
+                "grant_type": "refresh_token",
+                "refresh_token": account["refresh_token"],
+                "client_id": client_id,
+                "client_secret": client_secret,
+            },
+        ).encode()
+        req = urllib.request.Request(token_url, data=body, method="POST")  # noqa: S310
+        req.add_header("Content-Type", "application/x-www-form-urlencoded")
+        with urllib.request.urlopen(req, timeout=30) as res:  # noqa: S310
+            tokens = json.load(res)
+
+        out = {key: tokens[key] for key in FIELDS if key in tokens}
+        if "expires_in" in tokens:
+            out["expires_at"] = int(time.time()) + int(tokens["expires_in"])
+        return out
+
+    return refresh
+
+
+def _as_dict(acc: m.Account) -> Account:
+    return Account(
+        access_token=acc.access_token,
+        token_type=acc.token_type,
+        id_token=acc.id_token,
+        refresh_token=acc.refresh_token,
+        scope=acc.scope,
+        expires_at=acc.expires_at,
+        session_state=acc.session_state,
+        providerAccountId=acc.provider_account_id,
+        provider=acc.provider,
+        userId=acc.user_id,
+        type=acc.type,
+    )
+
+
+def refresh_expiring(
+    within: timedelta,
+    concurrency: int = 8,
+    batch_size: int = 500,
+) -> tuple[int, int]:
+    """
+    Refreshes tokens expiring within the given window.
+    Returns the number of refreshed and failed accounts.
+    """
+    handlers = refreshers()
+    accounts = claim(within, handlers, batch_size)
+
+    def refresh(acc: m.Account) -> dict | None:
+        try:
+            tokens = handlers[acc.provider](_as_dict(acc))
+        except Exception:
+            logger.exception(f"Could not refresh token of account {acc.pk}")
+            return None
+        return {"expires_at": None} | {key: tokens[key] for key in FIELDS if key in tokens}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(refresh, accounts))
+
+    refreshed = failed = 0
+    now = int(time.time())
+    for acc, tokens in zip(accounts, results, strict=True):
+        # a sign-in may have linked new tokens since they were read
+        current = m.Account.objects.filter(
+            pk=acc.pk,
+            expires_at=acc.expires_at,
+            refresh_token=acc.refresh_token,
+        )
+        if tokens is None:
+            failed += 1
+            current.update(
+                refresh_failures=F("refresh_failures") + 1,
+                refresh_retry_at=now + min(60 * 2**acc.refresh_failures, MAX_BACKOFF),
+            )
+        elif current.update(**tokens, refresh_failures=0, refresh_retry_at=None):
+            refreshed += 1
+        else:
+            logger.info(f"Tokens of account {acc.pk} changed while refreshing")
+    return refreshed, failed
@@ -0,0 +1,250 @@
+"""
+Session cache shared by the worker processes of a host through a memory-mapped
+file, enabled by pointing `AUTHJS_SHARED_SESSION_CACHE` at a path, preferably
+on a tmpfs such as `/dev/shm`.
+
+The file is a fixed-size hash table of `WAYS`-slot buckets mapping a digest of
+the session token to the user ids, Auth.js and builtin, and the time until
+which the entry is valid.
+The first worker creates the file with a header recording the format and the
+table geometry, later workers map it only when their settings match. A live
+table is never resized, a mismatch raises `ImproperlyConfigured` instead.
+Reads take no lock: every slot carries a sequence number that writers make odd
+while they rewrite the slot, readers retry when it was odd or changed. Stores to
+the mapping are not ordered on every CPU, ARM may show a reader the final
+sequence number next to a torn slot, so a CRC32 of the slot data is checked as
+well. Writers
+lock one of `STRIPES` stripes, with a thread lock and a `lockf` byte-range lock
+so other processes are excluded too. A full bucket evicts with the clock
+algorithm, hits set the reference bit and the sweep clears it once before
+evicting.
+"""
+
+import contextlib
+import functools
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+WAYS = 8
+STRIPES = 64
+RETRIES = 4
+USER_SIZE = 96
+
+MAGIC = b"AUTHJSSC"
+FORMAT = 2
+# magic, format version, bucket count, ways, user ids size
+HEADER = struct.Struct("<8sIIII")
+# slots start after the header, aligned
+DATA = 64
+# byte range locked while the file is created, past the stripe locks
+INIT_LOCK = STRIPES
+
+# seq, ref, key, valid until, user ids length, user ids joined by a null byte,
+# CRC32 of the fields between ref and itself
+SEQ = struct.Struct("<I")
+SLOT = struct.Struct(f"<IB16sdB{USER_SIZE}sI")
+BODY = struct.Struct(f"<16sdB{USER_SIZE}s")
+REF = SEQ.size
+CHECKED = slice(REF + 1, REF + 1 + BODY.size)
+# the first byte of a bucket is the clock hand
+BUCKET = 8 + WAYS * SLOT.size
+EMPTY = bytes(16)
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class SharedSessionCache:
+    def __init__(self, path: str, slots: int) -> None:
+        if fcntl is None:
+            raise ImproperlyConfigured("AUTHJS_SHARED_SESSION_CACHE requires fcntl")  # noqa: EM101, TRY003
+
+        self.buckets = max(1, slots // WAYS)
+        size = DATA + self.buckets * BUCKET
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._attach(path, size)
+        except BaseException:
+            os.close(self.fd)
+            raise
+        self.mm = mmap.mmap(self.fd, size)
+        self.locks = [threading.Lock() for _ in range(STRIPES)]
+
+    def _attach(self, path: str, size: int) -> None:
+        header = HEADER.pack(MAGIC, FORMAT, self.buckets, WAYS, USER_SIZE)
+        with self._lock_file(INIT_LOCK):
+            if os.fstat(self.fd).st_size == 0:
+                os.ftruncate(self.fd, size)
+                os.pwrite(self.fd, header, 0)
+            elif os.pread(self.fd, HEADER.size, 0) != header or os.fstat(self.fd).st_size != size:
+                raise ImproperlyConfigured(  # noqa: TRY003
+                    f"{path} holds a session table with another format or size, "  # noqa: EM102
+                    "remove it or point AUTHJS_SHARED_SESSION_CACHE at a new path",
+                )
+
+    def _bucket(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self.buckets
+
+    @contextlib.contextmanager
+    def _lock_file(self, index: int) -> Iterator[None]:
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, index)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, index)
+
+    @contextlib.contextmanager
+    def _lock(self, bucket: int) -> Iterator[None]:
+        stripe = bucket % STRIPES
+        with self.locks[stripe], self._lock_file(stripe):
+            yield
+
+    def _read(self, offset: int) -> tuple | None:
+        for _ in range(RETRIES):
+            raw = self.mm[offset : offset + SLOT.size]
+            slot = SLOT.unpack(raw)
+            if (
+                slot[0] % 2 == 0
+                and SEQ.unpack_from(self.mm, offset)[0] == slot[0]
+                and zlib.crc32(raw[CHECKED]) == slot[6]
+            ):
+                return slot
+        return None
+
+    def _write(self, offset: int, key: bytes, valid_until: float, user: bytes) -> None:
+        seq = (SEQ.unpack_from(self.mm, offset)[0] + 1) % 2**32
+        check = zlib.crc32(BODY.pack(key, valid_until, len(user), user))
+        SEQ.pack_into(self.mm, offset, seq)
+        SLOT.pack_into(self.mm, offset, seq, 0, key, valid_until, len(user), user, check)
+        SEQ.pack_into(self.mm, offset, (seq + 1) % 2**32)
+
+    def _slots(self, bucket: int) -> range:
+        start = DATA + bucket * BUCKET + 8
+        return range(start, start + WAYS * SLOT.size, SLOT.size)
+
+    def get(self, token: str) -> tuple[str, str | None, float] | None:
+        """User id, builtin user id and the timestamp until which the entry is valid."""
+        key = _digest(token)
+        for offset in self._slots(self._bucket(key)):
+            # other keys are skipped before paying for the validated read
+            if self.mm[offset + CHECKED.start : offset + CHECKED.start + len(key)] != key:
+                continue
+            slot = self._read(offset)
+            if slot is None or slot[2] != key:
+                continue
+            _, _, _, valid_until, length, user, _ = slot
+            if valid_until <= time.time():
+                return None
+            self.mm[offset + REF] = 1
+            user_id, builtin_user_id = user[:length].decode().split("\0")
+            return user_id, builtin_user_id or None, valid_until
+        return None
+
+    def set(
+        self,
+        token: str,
+        user_id: str,
+        valid_until: float,
+        builtin_user_id: object = None,
+    ) -> None:
+        builtin = "" if builtin_user_id is None else str(builtin_user_id)
+        user = f"{user_id}\0{builtin}".encode()
+        if len(user) > USER_SIZE:
+            return
+
+        key = _digest(token)
+        bucket = self._bucket(key)
+        with self._lock(bucket):
+            self._write(self._victim(bucket, key), key, valid_until, user)
+
+    def _victim(self, bucket: int, key: bytes) -> int:
+        slots = self._slots(bucket)
+        now = time.time()
+        for offset in slots:
+            _, _, k, valid_until, _, _, _ = SLOT.unpack_from(self.mm, offset)
+            if k in (key, EMPTY) or valid_until <= now:
+                return offset
+
+        hand = self.mm[DATA + bucket * BUCKET]
+        # at most one full sweep clears every reference bit
+        for _ in range(2 * WAYS):
+            offset = slots[hand]
+            hand = (hand + 1) % WAYS
+            if not self.mm[offset + REF]:
+                break
+            self.mm[offset + REF] = 0
+        self.mm[DATA + bucket * BUCKET] = hand
+        return offset
+
+    def delete(self, token: str) -> None:
+        key = _digest(token)
+        bucket = self._bucket(key)
+        with self._lock(bucket):
+            for offset in self._slots(bucket):
+                if SLOT.unpack_from(self.mm, offset)[2] == key:
+                    self._write(offset, EMPTY, 0, b"")
+
+    def delete_user(self, user_id: str) -> None:
+        prefix = f"{user_id}\0".encode()
+        for bucket in range(self.buckets):
+            for offset in self._slots(bucket):
+                _, _, k, _, _, user, _ = SLOT.unpack_from(self.mm, offset)
+                if k == EMPTY or not user.startswith(prefix):
+                    continue
+                with self._lock(bucket):
+                    if SLOT.unpack_from(self.mm, offset)[5].startswith(prefix):
+                        self._write(offset, EMPTY, 0, b"")
+
+    def close(self) -> None:
+        self.mm.close()
+        os.close(self.fd)
+
+
+@functools.cache
+def _open(path: str, slots: int) -> SharedSessionCache:
+    return SharedSessionCache(path, slots)
+
+
+def get_cache() -> SharedSessionCache | None:
+    path = getattr(settings, "AUTHJS_SHARED_SESSION_CACHE", None)
+    if not path:
+        return None
+    return _open(path, getattr(settings, "AUTHJS_SHARED_SESSION_CACHE_SLOTS", 65536))
+
+
+def timeout() -> int:
+    return getattr(settings, "AUTHJS_SHARED_SESSION_CACHE_TIMEOUT", 60)
+
+
+def invalidate(token: str) -> None:
+    if (cache := get_cache()) is not None:
+        cache.delete(token)
+
+
+def invalidate_user(user_id: str) -> None:
+    if (cache := get_cache()) is not None:
+        cache.delete_user(user_id)
+
+
+@receiver(setting_changed)
+def _reset(setting: str, **_kwargs: Any) -> None:  # noqa: ANN401
+    if setting.startswith("AUTHJS_SHARED_SESSION_CACHE"):
+        _open.cache_clear()
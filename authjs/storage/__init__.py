@@ -0,0 +1,34 @@
+"""
+Storage engines behind the adapter operations.
+
+`AUTHJS_STORAGE` is the dotted path of the engine class, one instance is
+shared by the process.
+"""
+
+import functools
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+if TYPE_CHECKING:
+    from authjs.storage.base import Storage
+
+DEFAULT = "authjs.storage.orm.ORMStorage"
+
+
+@functools.cache
+def _load(path: str) -> "Storage":
+    return import_string(path)()
+
+
+def get_storage() -> "Storage":
+    return _load(getattr(settings, "AUTHJS_STORAGE", DEFAULT))
+
+
+@receiver(setting_changed)
+def _reset(setting: str, **_kwargs: Any) -> None:  # noqa: ANN401
+    if setting == "AUTHJS_STORAGE":
+        _load.cache_clear()
@@ -0,0 +1,61 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from django.contrib.auth.base_user import AbstractBaseUser
+
+    from authjs.adapter import Account, Session, User, VerificationToken
+
+
+@dataclass(frozen=True, slots=True)
+class SessionRecord:
+    """What the middleware needs to know about a session token."""
+
+    session_token: str
+    user_id: str
+    expires: datetime
+    last_seen: datetime | None = None
+    # engines that can resolve it in the same lookup save a query later
+    builtin_user_id: object = None
+
+
+def etag(*parts: object) -> str:
+    return hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()
+
+
+class Storage(Protocol):
+    # User Management
+    def create_user(self, user: "User") -> "User": ...
+    def get_user(self, user: dict) -> "User": ...
+    def get_user_by_account(self, acc: "Account") -> "User": ...
+    def update_user(self, user: "User") -> "User": ...
+    def link_account(self, account: "Account") -> "Account": ...
+    def delete_user(self, user: dict) -> "User": ...
+    def unlink_account(self, account: "Account") -> "Account": ...
+
+    # Session Management
+    def create_session(self, session: "Session") -> "Session": ...
+    def get_session_and_user(self, session: "Session") -> dict: ...
+    def update_session(self, session: "Session") -> "Session": ...
+    def delete_session(self, session: "Session") -> "Session": ...
+
+    # VerificationToken Management
+    def get_user_by_email(self, user: "User") -> "User": ...
+    def create_verification_token(self, token: "VerificationToken") -> "VerificationToken": ...
+    def use_verification_token(self, token: "VerificationToken") -> "VerificationToken": ...
+
+    # ETags, None when the record does not exist
+    def user_etag(self, user: dict) -> str | None: ...
+    def user_by_email_etag(self, user: "User") -> str | None: ...
+    def session_and_user_etag(self, session: "Session") -> str | None: ...
+
+    # Middleware
+    def get_session(self, session_token: str) -> SessionRecord | None: ...
+    def get_django_user(
+        self,
+        user_id: str,
+        builtin_user_id: object = None,
+    ) -> "AbstractBaseUser | None": ...
+    def touch_sessions(self, seen: dict[str, datetime]) -> None: ...
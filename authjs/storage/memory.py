@@ -0,0 +1,344 @@
+"""
+Thread-safe in-memory storage engine.
+
+Meant for ephemeral preview environments, load testing and fast tests, all
+data is lost when the process exits and is not shared between workers.
+Expired sessions and verification tokens are dropped lazily using min-heaps
+ordered by expiry, so purging costs nothing while nothing has expired.
+`request.user` is an `EphemeralUser` that has no database row and cannot be
+saved or referenced by foreign keys.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from datetime import UTC, datetime
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.dateparse import parse_datetime
+
+from authjs.adapter import Account, Session, User, VerificationToken
+from authjs.storage.base import SessionRecord, etag
+
+
+def _datetime(value: datetime | str | None) -> datetime | None:
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value
+
+
+def _int(value: int | str | None) -> int | None:
+    return None if value in (None, "") else int(value)
+
+
+def _missing(kind: type) -> ObjectDoesNotExist:
+    return ObjectDoesNotExist(f"{kind.__name__} matching query does not exist.")
+
+
+class EphemeralUser(AnonymousUser):
+    """Authenticated user that only exists in memory, saving it raises."""
+
+    def __init__(self, user: User) -> None:
+        self.id = self.pk = user["id"]
+        self.username = user["name"] or ""
+        self.email = user["email"] or ""
+
+    def __str__(self) -> str:
+        return self.username
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, EphemeralUser) and other.pk == self.pk
+
+    def __hash__(self) -> int:
+        return hash(self.pk)
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+
+class MemoryStorage:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.users: dict[str, User] = {}
+        self.emails: dict[str, str] = {}
+        self.accounts: dict[tuple[str, str], Account] = {}
+        self.sessions: dict[str, Session] = {}
+        self.last_seen: dict[str, datetime] = {}
+        self.tokens: dict[str, VerificationToken] = {}
+        self.versions: dict[tuple[str, str], int] = {}
+        self.session_expiry: list[tuple[datetime, str]] = []
+        self.token_expiry: list[tuple[datetime, str]] = []
+        # one counter for every key, seeded from the clock, so versions never repeat
+        # after a delete or a restart
+        self.clock = itertools.count(time.time_ns())
+
+    def _purge(self) -> None:
+        now = datetime.now(UTC)
+        while self.session_expiry and self.session_expiry[0][0] <= now:
+            expires, key = heapq.heappop(self.session_expiry)
+            # entries are not removed on update, skip the ones that were extended
+            if key in self.sessions and self.sessions[key]["expires"] == expires:
+                self._drop_session(key)
+        while self.token_expiry and self.token_expiry[0][0] <= now:
+            expires, key = heapq.heappop(self.token_expiry)
+            if key in self.tokens and self.tokens[key]["expires"] == expires:
+                del self.tokens[key]
+
+    def _bump(self, kind: str, key: str) -> None:
+        self.versions[kind, key] = next(self.clock)
+
+    def _user(self, user_id: str | None) -> User:
+        self._purge()
+        if user_id not in self.users:
+            raise _missing(User)
+        return self.users[user_id]
+
+    def _session(self, session_token: str | None) -> Session:
+        self._purge()
+        if session_token not in self.sessions:
+            raise _missing(Session)
+        return self.sessions[session_token]
+
+    def _drop_session(self, session_token: str) -> None:
+        del self.sessions[session_token]
+        self.last_seen.pop(session_token, None)
+        self.versions.pop(("session", session_token), None)
+
+    # User Management
+    def create_user(self, user: User) -> User:
+        with self.lock:
+            user_id = user.get("id") or uuid.uuid4().hex
+            if user_id in self.users:
+                return User(**self.users[user_id])
+
+            email = user.get("email")
+            if email is not None and email in self.emails:
+                raise ValueError(f"User with email {email} already exists")  # noqa: EM102, TRY003
+
+            out = User(
+                id=user_id,
+                name=user.get("name"),
+                email=email,
+                emailVerified=_datetime(user.get("emailVerified")),
+                image=user.get("image"),
+            )
+            self.users[user_id] = out
+            if email is not None:
+                self.emails[email] = user_id
+            self._bump("user", user_id)
+            return User(**out)
+
+    def get_user(self, user: dict) -> User:
+        with self.lock:
+            return User(**self._user(user["userId"]))
+
+    def get_user_by_account(self, acc: Account) -> User:
+        with self.lock:
+            account = self.accounts.get((acc["provider"], acc["providerAccountId"]))
+            if account is None or account["userId"] != acc["userId"]:
+                raise _missing(Account)
+            return User(**self._user(account["userId"]))
+
+    def update_user(self, user: User) -> User:
+        with self.lock:
+            usr = self._user(user["id"])
+            email = user.get("email", usr["email"])
+            if email != usr["email"]:
+                if email is not None and email in self.emails:
+                    raise ValueError(f"User with email {email} already exists")  # noqa: EM102, TRY003
+                self.emails.pop(usr["email"], None)
+                if email is not None:
+                    self.emails[email] = usr["id"]
+
+            usr["name"] = user.get("name", usr["name"])
+            usr["email"] = email
+            usr["emailVerified"] = _datetime(user.get("emailVerified", usr["emailVerified"]))
+            usr["image"] = user.get("image", usr["image"])
+            self._bump("user", usr["id"])
+            return User(**usr)
+
+    def link_account(self, account: Account) -> Account:
+        with self.lock:
+            self._user(account["userId"])
+            key = (account.get("provider"), account.get("providerAccountId"))
+            existing = self.accounts.get(key)
+            if existing is not None and existing["userId"] != account["userId"]:
+                raise ValueError("Account is linked to another user")  # noqa: EM101, TRY003
+
+            out = Account(
+                access_token=account.get("access_token"),
+                token_type=account.get("token_type"),
+                id_token=account.get("id_token"),
+                refresh_token=account.get("refresh_token"),
+                scope=account.get("scope"),
+                expires_at=_int(account.get("expires_at")),
+                session_state=account.get("session_state"),
+                providerAccountId=key[1],
+                provider=key[0],
+                userId=account["userId"],
+                type=account.get("type"),
+            )
+            self.accounts[key] = out
+            return Account(**out)
+
+    def delete_user(self, user: dict) -> User:
+        with self.lock:
+            usr = self._user(user["userId"])
+            del self.users[usr["id"]]
+            self.emails.pop(usr["email"], None)
+            self.versions.pop(("user", usr["id"]), None)
+            for key in [k for k, acc in self.accounts.items() if acc["userId"] == usr["id"]]:
+                del self.accounts[key]
+            for token in [t for t, s in self.sessions.items() if s["userId"] == usr["id"]]:
+                self._drop_session(token)
+            return User(**usr)
+
+    def unlink_account(self, account: Account) -> Account:
+        with self.lock:
+            key = (account["provider"], account["providerAccountId"])
+            acc = self.accounts.get(key)
+            if acc is None or acc["userId"] != account["userId"]:
+                raise _missing(Account)
+            del self.accounts[key]
+            return Account(**acc)
+
+    # Session Management
+    def create_session(self, session: Session) -> Session:
+        with self.lock:
+            self._user(session["userId"])
+            token = session["sessionToken"]
+            if token in self.sessions:
+                raise ValueError(f"Session {token} already exists")  # noqa: EM102, TRY003
+
+            out = Session(
+                sessionToken=token,
+                userId=session["userId"],
+                expires=_datetime(session["expires"]),
+            )
+            self.sessions[token] = out
+            self.last_seen[token] = datetime.now(UTC)
+            heapq.heappush(self.session_expiry, (out["expires"], token))
+            self._bump("session", token)
+            return Session(**out)
+
+    def get_session_and_user(self, session: Session) -> dict:
+        with self.lock:
+            s = self._session(session["sessionToken"])
+            return {"session": Session(**s), "user": User(**self._user(s["userId"]))}
+
+    def update_session(self, session: Session) -> Session:
+        with self.lock:
+            s = self._session(session["sessionToken"])
+            if session.get("expires") is not None:
+                s["expires"] = _datetime(session["expires"])
+                heapq.heappush(self.session_expiry, (s["expires"], s["sessionToken"]))
+            if session.get("userId") is not None:
+                self._user(session["userId"])
+                s["userId"] = session["userId"]
+            # updates from Auth.js count as activity like the tracked requests
+            self.last_seen[s["sessionToken"]] = max(
+                self.last_seen[s["sessionToken"]],
+                datetime.now(UTC),
+            )
+            self._bump("session", s["sessionToken"])
+            return Session(**s)
+
+    def delete_session(self, session: Session) -> Session:
+        with self.lock:
+            s = self._session(session["sessionToken"])
+            self._drop_session(s["sessionToken"])
+            return Session(**s)
+
+    # VerificationToken Management
+    def get_user_by_email(self, user: User) -> User:
+        with self.lock:
+            return User(**self._user(self.emails.get(user["email"])))
+
+    def create_verification_token(self, token: VerificationToken) -> VerificationToken:
+        with self.lock:
+            self._purge()
+            key = token["token"]
+            if key in self.tokens:
+                raise ValueError("Verification token already exists")  # noqa: EM101, TRY003
+
+            self.tokens[key] = VerificationToken(
+                identifier=token["identifier"],
+                expires=_datetime(token["expires"]),
+                token=token["token"],
+            )
+            heapq.heappush(self.token_expiry, (self.tokens[key]["expires"], key))
+            return token
+
+    def use_verification_token(self, token: VerificationToken) -> VerificationToken:
+        with self.lock:
+            self._purge()
+            key = token["token"]
+            if key not in self.tokens or self.tokens[key]["identifier"] != token["identifier"]:
+                raise _missing(VerificationToken)
+            return VerificationToken(**self.tokens.pop(key))
+
+    # ETags
+    def user_etag(self, user: dict) -> str | None:
+        with self.lock:
+            user_id = user.get("userId")
+            version = self.versions.get(("user", user_id))
+            return None if version is None else etag(user_id, version)
+
+    def user_by_email_etag(self, user: User) -> str | None:
+        with self.lock:
+            return self.user_etag({"userId": self.emails.get(user.get("email"))})
+
+    def session_and_user_etag(self, session: Session) -> str | None:
+        with self.lock:
+            self._purge()
+            token = session.get("sessionToken")
+            if token not in self.sessions:
+                return None
+            user_id = self.sessions[token]["userId"]
+            return etag(
+                token,
+                self.versions.get(("session", token)),
+                user_id,
+                self.versions.get(("user", user_id)),
+            )
+
+    # Middleware
+    def get_session(self, session_token: str) -> SessionRecord | None:
+        with self.lock:
+            self._purge()
+            s = self.sessions.get(session_token)
+            if s is None:
+                return None
+            return SessionRecord(
+                session_token=session_token,
+                user_id=s["userId"],
+                expires=s["expires"],
+                last_seen=self.last_seen.get(session_token),
+            )
+
+    def get_django_user(
+        self,
+        user_id: str,
+        builtin_user_id: object = None,  # noqa: ARG002
+    ) -> EphemeralUser | None:
+        with self.lock:
+            usr = self.users.get(user_id)
+            return None if usr is None else EphemeralUser(usr)
+
+    def touch_sessions(self, seen: dict[str, datetime]) -> None:
+        with self.lock:
+            for token, last_seen in seen.items():
+                if token in self.sessions and (
+                    token not in self.last_seen or self.last_seen[token] < last_seen
+                ):
+                    self.last_seen[token] = last_seen
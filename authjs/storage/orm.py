@@ -0,0 +1,293 @@
+"""
+Storage engine backed by `authjs.models` through the Django ORM.
+"""
+
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.db.models import Case, F, Q, Value, When
+
+import authjs.models as m
+from authjs import cache
+from authjs.adapter import Account, Session, User, VerificationToken
+from authjs.projection import Projection
+from authjs.storage.base import SessionRecord, etag
+
+# Projections
+# reads select the exact columns they return instead of instantiating models
+USER_FIELDS = ("id", "name", "email", "email_verified", "image")
+
+
+def _user(row: tuple) -> User:
+    pk, name, email, email_verified, image = row
+    return User(id=pk, name=name, email=email, emailVerified=email_verified, image=image)
+
+
+def _related(relation: str, fields: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(f"{relation}__{field}" for field in fields)
+
+
+USER_BY_ID = Projection(m.User, USER_FIELDS, ("pk",))
+USER_BY_EMAIL = Projection(m.User, USER_FIELDS, ("email",))
+USER_BY_ACCOUNT = Projection(
+    m.Account,
+    _related("user", USER_FIELDS),
+    ("provider_account_id", "provider", "user__id"),
+)
+SESSION_AND_USER = Projection(
+    m.Session,
+    ("session_key", "expire_date", *_related("session_user", USER_FIELDS)),
+    ("session_key",),
+)
+SESSION_RECORD = Projection(
+    m.Session,
+    ("session_key", "session_user", "expire_date", "last_seen", "updated_at", "session_user__user"),
+    ("session_key",),
+)
+
+
+def _account(acc: m.Account) -> Account:
+    return Account(
+        access_token=acc.access_token,
+        token_type=acc.token_type,
+        id_token=acc.id_token,
+        refresh_token=acc.refresh_token,
+        scope=acc.scope,
+        expires_at=acc.expires_at,
+        session_state=acc.session_state,
+        providerAccountId=acc.provider_account_id,
+        provider=acc.provider,
+        userId=acc.user_id,
+        type=acc.type,
+    )
+
+
+class ORMStorage:
+    # User Management
+    def create_user(self, user: User) -> User:
+        builtin, _ = get_user_model().objects.get_or_create(
+            email=user.get("email"),
+            username=user.get("name") or "",
+        )
+
+        out, created = m.User.objects.get_or_create(
+            id=user.get("id"),
+            defaults={
+                "id": user.get("id"),
+                "user": builtin,
+                "name": user.get("name"),
+                "email": user.get("email"),
+                "email_verified": user.get("emailVerified"),
+                "image": user.get("image"),
+            },
+        )
+        if created:
+            out.save()
+        return User(
+            id=out.id,
+            name=out.name,
+            email=out.email,
+            emailVerified=out.email_verified,
+            image=out.image,
+        )
+
+    def get_user(self, user: dict) -> User:
+        return _user(USER_BY_ID.get(user["userId"]))
+
+    def get_user_by_account(self, acc: Account) -> User:
+        return _user(USER_BY_ACCOUNT.get(acc["providerAccountId"], acc["provider"], acc["userId"]))
+
+    def update_user(self, user: User) -> User:
+        usr = m.User.objects.get(pk=user["id"])
+        usr.name = user.get("name", usr.name)
+        usr.email = user.get("email", usr.email)
+        usr.email_verified = user.get("emailVerified", usr.email_verified)
+        usr.image = user.get("image", usr.image)
+        usr.save()
+        return User(
+            id=usr.id,
+            name=usr.name,
+            email=usr.email,
+            emailVerified=usr.email_verified,
+            image=usr.image,
+        )
+
+    def link_account(self, account: Account) -> Account:
+        acc, _ = m.Account.objects.get_or_create(
+            user=m.User.objects.get(pk=account["userId"]),
+            provider=account.get("provider"),
+            provider_account_id=account.get("providerAccountId"),
+        )
+
+        acc.access_token = account.get("access_token")
+        acc.token_type = account.get("token_type")
+        acc.id_token = account.get("id_token")
+        acc.refresh_token = account.get("refresh_token")
+        acc.scope = account.get("scope")
+        acc.expires_at = account.get("expires_at")
+        acc.session_state = account.get("session_state")
+        acc.type = account.get("type")
+        # fresh tokens from a sign-in get a clean refresh record
+        acc.refresh_failures = 0
+        acc.refresh_retry_at = None
+        acc.save()
+        return _account(acc)
+
+    def delete_user(self, user: dict) -> User:
+        u = m.User.objects.get(pk=user["userId"])
+        usr = User(
+            id=u.id,
+            name=u.name,
+            email=u.email,
+            emailVerified=u.email_verified,
+            image=u.image,
+        )
+        u.delete()
+        return usr
+
+    def unlink_account(self, account: Account) -> Account:
+        a = m.Account.objects.get(
+            provider_account_id=account["providerAccountId"],
+            provider=account["provider"],
+            user__id=account["userId"],
+        )
+        acc = _account(a)
+        a.delete()
+        return acc
+
+    # Session Management
+    def create_session(self, session: Session) -> Session:
+        s = m.Session(
+            session_key=session["sessionToken"],
+            user=m.User.objects.get(pk=session["userId"]),
+            expires=session["expires"],
+        )
+        s.save()
+        return Session(
+            sessionToken=s.session_token,
+            userId=s.session_user_id,
+            expires=s.expires,
+        )
+
+    def get_session_and_user(self, session: Session) -> dict:
+        session_key, expires, *user_row = SESSION_AND_USER.get(session["sessionToken"])
+        user_out = _user(user_row)
+        return {
+            "session": Session(sessionToken=session_key, userId=user_out["id"], expires=expires),
+            "user": user_out,
+        }
+
+    def update_session(self, session: Session) -> Session:
+        s = m.Session.objects.get(session_key=session["sessionToken"])
+        s.expires = session.get("expires", s.expires)
+        if session["userId"] is not None:
+            s.user = m.User.objects.get(pk=session["userId"])
+
+        s.save()
+        return Session(
+            sessionToken=s.session_token,
+            userId=s.session_user_id,
+            expires=s.expires,
+        )
+
+    def delete_session(self, session: Session) -> Session:
+        s = m.Session.objects.get(session_key=session["sessionToken"])
+        out = Session(
+            sessionToken=s.session_token,
+            userId=s.session_user_id,
+            expires=s.expires,
+        )
+        s.delete()
+        return out
+
+    # VerificationToken Management
+    def get_user_by_email(self, user: User) -> User:
+        return _user(USER_BY_EMAIL.get(user["email"]))
+
+    def create_verification_token(self, token: VerificationToken) -> VerificationToken:
+        m.VerificationToken(
+            identifier=token["identifier"],
+            expires=token["expires"],
+            token=token["token"],
+        ).save()
+        return token
+
+    def use_verification_token(self, token: VerificationToken) -> VerificationToken:
+        vtoken = m.VerificationToken.objects.get(
+            token=token["token"],
+            identifier=token["identifier"],
+        )
+        out = VerificationToken(
+            token=vtoken.token,
+            identifier=vtoken.identifier,
+            expires=vtoken.expires,
+        )
+        vtoken.delete()
+        return out
+
+    # ETags
+    # derived from row versions so conditional requests skip loading and serialising
+    def user_etag(self, user: dict) -> str | None:
+        row = m.User.objects.filter(pk=user.get("userId")).values_list("id", "updated_at").first()
+        return etag(*row) if row else None
+
+    def user_by_email_etag(self, user: User) -> str | None:
+        row = m.User.objects.filter(email=user.get("email")).values_list("id", "updated_at").first()
+        return etag(*row) if row else None
+
+    def session_and_user_etag(self, session: Session) -> str | None:
+        row = (
+            m.Session.objects.filter(session_key=session.get("sessionToken"))
+            .values_list(
+                "session_key",
+                "updated_at",
+                "session_user__id",
+                "session_user__updated_at",
+            )
+            .first()
+        )
+        return etag(*row) if row else None
+
+    # Middleware
+    def get_session(self, session_token: str) -> SessionRecord | None:
+        try:
+            row = SESSION_RECORD.get(session_token)
+        except m.Session.DoesNotExist:
+            return None
+        key, user_id, expires, last_seen, updated_at, builtin = row
+        # creating or extending a session counts as activity, it is all that is
+        # known of sessions only used through Auth.js or older than the tracking
+        last_seen = max(last_seen or updated_at, updated_at)
+        return SessionRecord(key, user_id, expires, last_seen, builtin)
+
+    def get_django_user(
+        self,
+        user_id: str,
+        builtin_user_id: object = None,
+    ) -> AbstractBaseUser | None:
+        if builtin_user_id is None:
+            try:
+                builtin_user_id = cache.get_builtin_user_id(
+                    user_id,
+                    lambda: m.User.objects.values_list("user_id", flat=True).get(pk=user_id),
+                )
+            except m.User.DoesNotExist:
+                return None
+
+        return get_user_model().objects.filter(pk=builtin_user_id).first()
+
+    def touch_sessions(self, seen: dict[str, datetime]) -> None:
+        # conditional per token so timestamps never move backwards across workers
+        m.Session.objects.filter(pk__in=seen).update(
+            last_seen=Case(
+                *(
+                    When(
+                        Q(pk=token) & (Q(last_seen__isnull=True) | Q(last_seen__lt=last_seen)),
+                        then=Value(last_seen),
+                    )
+                    for token, last_seen in seen.items()
+                ),
+                default=F("last_seen"),
+            ),
+        )
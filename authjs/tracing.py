@@ -0,0 +1,118 @@
+"""
+Tracing spans and slow operation log for adapter calls.
+
+`AUTHJS_TRACER` accepts any object implementing OpenTelemetry's
+`Tracer.start_as_current_span`, or a dotted path to one, spans are not
+recorded when unset. Incoming W3C `traceparent` headers are extracted when
+a tracer is set and `opentelemetry` is installed.
+
+Operations slower than `AUTHJS_SLOW_THRESHOLD_MS` are logged to
+`authjs.slow` with their query count and slowest SQL statement.
+"""
+
+import contextlib
+import functools
+import logging
+import time
+from collections.abc import Callable, Iterator, Mapping
+from types import ModuleType
+from typing import Any, ParamSpec, TypeVar
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("authjs.slow")
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class NoopTracer:
+    @contextlib.contextmanager
+    def start_as_current_span(self, _name: str, **_kwargs: Any) -> Iterator[None]:  # noqa: ANN401
+        yield None
+
+
+NOOP = NoopTracer()
+
+
+@functools.cache
+def _propagate() -> ModuleType | None:
+    # resolving the propagators is slow, only paid once a tracer is set
+    try:
+        from opentelemetry import propagate
+    except ImportError:
+        return None
+    return propagate
+
+
+def get_tracer() -> Any:  # noqa: ANN401
+    tracer = getattr(settings, "AUTHJS_TRACER", None)
+    if tracer is None:
+        return NOOP
+    return import_string(tracer) if isinstance(tracer, str) else tracer
+
+
+class QueryLog:
+    def __init__(self) -> None:
+        self.count = 0
+        self.slowest_sql: str | None = None
+        self.slowest_ms = 0.0
+
+    def __call__(self, execute: Callable, sql: str, *args: Any) -> Any:  # noqa: ANN401
+        start = time.perf_counter()
+        try:
+            return execute(sql, *args)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.count += 1
+            if self.slowest_sql is None or ms > self.slowest_ms:
+                self.slowest_sql, self.slowest_ms = sql, ms
+
+
+@contextlib.contextmanager
+def span(
+    name: str,
+    headers: Mapping[str, str] | None = None,
+    attributes: dict[str, Any] | None = None,
+) -> Iterator[None]:
+    threshold = getattr(settings, "AUTHJS_SLOW_THRESHOLD_MS", None)
+    tracer = get_tracer()
+    context = None
+    if tracer is not NOOP and headers is not None and (propagate := _propagate()) is not None:
+        context = propagate.extract(headers)
+    queries = QueryLog()
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(
+            tracer.start_as_current_span(name, context=context, attributes=attributes),
+        )
+        if threshold is not None:
+            stack.enter_context(connection.execute_wrapper(queries))
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            if threshold is not None and ms >= threshold:
+                logger.warning(
+                    f"{name} took {ms:.1f}ms with {queries.count} queries",
+                    extra={
+                        "operation": name,
+                        "duration_ms": ms,
+                        "query_count": queries.count,
+                        "slowest_sql": queries.slowest_sql,
+                        "slowest_sql_ms": queries.slowest_ms,
+                    },
+                )
+
+
+def traced(fn: Callable[P, R]) -> Callable[P, R]:
+    @functools.wraps(fn)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with span(f"authjs.adapter.{fn.__name__}"):
+            return fn(*args, **kwargs)
+
+    return wrapper
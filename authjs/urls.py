@@ -1,96 +1,145 @@
+import functools
 from collections.abc import Callable
-from typing import Literal
+from datetime import UTC, datetime
+from types import ModuleType
+from typing import Literal, NamedTuple
 
 from django.http.request import HttpRequest
-from django.http.response import JsonResponse
+from django.http.response import HttpResponse, HttpResponseNotAllowed, JsonResponse
 from django.urls import path
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
 
 from authjs import adapter
+from authjs.idempotency import run_once
+from authjs.tracing import span
+from authjs.whoami import whoami
 
+MSGPACK = "application/msgpack"
 
-def as_view(method: Literal["GET", "POST", "PUT", "DELETE"], fn: Callable) -> Callable:
-    @csrf_exempt
-    @require_http_methods([method])
-    def view(request: HttpRequest) -> JsonResponse:
-        try:
-            return JsonResponse(fn(request.GET))
-        except Exception as e:  # noqa: BLE001
-            return JsonResponse({"errors": [str(e)]}, status=404)
 
-    return view
+@functools.cache
+def _msgpack() -> ModuleType | None:
+    # optional and only needed once a client asks for it
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
 
 
-urlpatterns = [
-    path(
-        "create-user/",
-        as_view("POST", adapter.create_user),
-        name="create-user",
-    ),
-    path(
-        "get-user/",
-        as_view("GET", adapter.get_user),
-        name="get-user",
-    ),
-    path(
-        "get-user-by-account/",
-        as_view("GET", adapter.get_user_by_account),
-        name="get-user-by-account",
-    ),
-    path(
-        "update-user/",
-        as_view("PUT", adapter.update_user),
-        name="update-user",
-    ),
-    path(
-        "link-account/",
-        as_view("POST", adapter.link_account),
-        name="link-account",
-    ),
-    path(
-        "delete-user/",
-        as_view("DELETE", adapter.delete_user),
-        name="delete-user",
-    ),
-    path(
-        "unlink-account/",
-        as_view("DELETE", adapter.unlink_account),
-        name="unlink-account",
-    ),
-    path(
-        "create-session/",
-        as_view("POST", adapter.create_session),
-        name="create-session",
-    ),
-    path(
-        "get-session-and-user/",
-        as_view("GET", adapter.get_session_and_user),
-        name="get-session-and-user",
-    ),
-    path(
-        "update-session/",
-        as_view("PUT", adapter.update_session),
-        name="update-session",
-    ),
-    path(
-        "delete-session/",
-        as_view("DELETE", adapter.delete_session),
-        name="delete-session",
-    ),
-    path(
-        "get-user-by-email/",
-        as_view("GET", adapter.get_user_by_email),
-        name="get-user-by-email",
+def wants_msgpack(request: HttpRequest) -> bool:
+    # only an explicit media type opts in, "*/*" keeps JSON as the default
+    return MSGPACK in request.headers.get("Accept", "") and (
+        any(f"{media.main_type}/{media.sub_type}" == MSGPACK for media in request.accepted_types)
+        and _msgpack() is not None
+    )
+
+
+def _aware(value: object) -> object:
+    # naive datetimes from USE_TZ=False are in TIME_ZONE, msgpack timestamps are UTC
+    if isinstance(value, dict):
+        return {key: _aware(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_aware(item) for item in value]
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        return timezone.make_aware(value).astimezone(UTC)
+    return value
+
+
+def respond(request: HttpRequest, data: dict, status: int = 200) -> HttpResponse:
+    if wants_msgpack(request):
+        response = HttpResponse(
+            _msgpack().packb(_aware(data), datetime=True),
+            content_type=MSGPACK,
+            status=status,
+        )
+    else:
+        response = JsonResponse(data, status=status)
+
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+class Route(NamedTuple):
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    fn: Callable
+    etag: Callable | None = None
+    retryable: bool = False
+    # responses carry credentials
+    sensitive: bool = False
+
+
+ROUTES = {
+    "create-user": Route("POST", adapter.create_user, retryable=True),
+    "get-user": Route("GET", adapter.get_user, adapter.user_etag),
+    "get-user-by-account": Route("GET", adapter.get_user_by_account),
+    "update-user": Route("PUT", adapter.update_user),
+    "link-account": Route("POST", adapter.link_account, retryable=True, sensitive=True),
+    "delete-user": Route("DELETE", adapter.delete_user),
+    "unlink-account": Route("DELETE", adapter.unlink_account),
+    "create-session": Route(
+        "POST",
+        adapter.create_session,
+        retryable=True,
+        sensitive=True,
     ),
-    path(
-        "create-verification-token/",
-        as_view("POST", adapter.create_verification_token),
-        name="create-verification-token",
+    "get-session-and-user": Route(
+        "GET",
+        adapter.get_session_and_user,
+        adapter.session_and_user_etag,
     ),
-    path(
-        "use-verification-token/",
-        as_view("DELETE", adapter.use_verification_token),
-        name="use-verification-token",
+    "update-session": Route("PUT", adapter.update_session),
+    "delete-session": Route("DELETE", adapter.delete_session),
+    "get-user-by-email": Route("GET", adapter.get_user_by_email, adapter.user_by_email_etag),
+    "create-verification-token": Route(
+        "POST",
+        adapter.create_verification_token,
+        retryable=True,
     ),
+    "use-verification-token": Route("DELETE", adapter.use_verification_token),
+}
+
+
+def call(request: HttpRequest, fn: Callable) -> HttpResponse:
+    with span(f"authjs.view.{fn.__name__}", request.headers, {"http.method": request.method}):
+        try:
+            return respond(request, fn(request.GET))
+        except Exception as e:  # noqa: BLE001
+            return respond(request, {"errors": [str(e)]}, status=404)
+
+
+def conditional(request: HttpRequest, fn: Callable, etag: Callable) -> HttpResponse:
+    value = etag(request.GET)
+    if value is not None and wants_msgpack(request):
+        value = f"{value}-msgpack"
+
+    value = None if value is None else quote_etag(value)
+    response = get_conditional_response(request, etag=value)
+    if response is None:
+        response = call(request, fn)
+    # errors must not be cached under the tag of the resource, 304 repeats it
+    if value is not None and response.status_code in (200, 304):
+        response.headers.setdefault("ETag", value)
+    return response
+
+
+@csrf_exempt
+def dispatch(request: HttpRequest, route: str) -> HttpResponse:
+    """Single view for every adapter route, looked up in `ROUTES`."""
+    method, fn, etag, retryable, sensitive = ROUTES[route]
+    if request.method != method:
+        return HttpResponseNotAllowed([method])
+    if retryable:
+        return run_once(fn.__name__, request, functools.partial(call, fn=fn), sensitive=sensitive)
+    if etag is not None:
+        return conditional(request, fn, etag)
+    return call(request, fn)
+
+
+urlpatterns = [
+    *(path(f"{name}/", dispatch, {"route": name}, name=name) for name in ROUTES),
+    path("whoami/", whoami, name="whoami"),
 ]
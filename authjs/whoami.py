@@ -0,0 +1,112 @@
+"""
+Session check for reverse proxy subrequests, nginx `auth_request` or Envoy
+`ext_authz`, so services outside Django can share the Auth.js sessions.
+
+`whoami` answers 200 with the user id in the response headers or 401, it only
+reads the session row through the storage engine. With `AUTHJS_WHOAMI_CACHE`
+set, answers are kept per token for `AUTHJS_WHOAMI_CACHE_TIMEOUT` seconds and
+the same lifetime is sent as `max-age` with `Vary: Cookie`, the proxy may cache
+them too as long as its cache key includes the session cookie. Signing out
+drops the cached answer, other changes such as deleting the user show once it
+expires.
+`WhoamiMiddleware` placed first in `MIDDLEWARE` answers before the rest of the
+stack runs.
+"""
+
+import hashlib
+import time
+from collections.abc import Callable
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.http import HttpRequest, HttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+
+from authjs import middleware
+from authjs.storage import get_storage
+
+USER_HEADER = "X-Authjs-User-Id"
+EXPIRES_HEADER = "X-Authjs-Session-Expires"
+
+
+def get_cache() -> BaseCache | None:
+    alias = getattr(settings, "AUTHJS_WHOAMI_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def timeout() -> int:
+    return getattr(settings, "AUTHJS_WHOAMI_CACHE_TIMEOUT", 5)
+
+
+def _key(token: str) -> str:
+    return f"authjs:whoami:{hashlib.sha256(token.encode()).hexdigest()}"
+
+
+def _load(token: str) -> tuple[str, float] | None:
+    session = get_storage().get_session(token)
+    if session is None:
+        return None
+
+    valid_until = session.expires
+    idle_timeout = getattr(settings, "AUTHJS_IDLE_TIMEOUT", None)
+    if idle_timeout is not None and session.last_seen is not None:
+        valid_until = min(valid_until, session.last_seen + timedelta(seconds=idle_timeout))
+    return session.user_id, valid_until.timestamp()
+
+
+def lookup(token: str) -> tuple[str, float] | None:
+    """User id and the timestamp until which the session is valid."""
+    cache = get_cache()
+    if cache is None:
+        found = _load(token)
+    else:
+        # an empty tuple caches unknown tokens as well
+        found = cache.get(_key(token))
+        if found is None:
+            found = _load(token) or ()
+            cache.set(_key(token), found, timeout())
+
+    if not found or found[1] <= time.time():
+        return None
+    return found
+
+
+def invalidate(token: str) -> None:
+    if (cache := get_cache()) is not None:
+        cache.delete(_key(token))
+
+
+@csrf_exempt
+def whoami(request: HttpRequest) -> HttpResponse:
+    token = request.COOKIES.get(middleware.cookie_name())
+    found = None if token is None else lookup(token)
+
+    max_age = timeout() if get_cache() is not None else 0
+    if found is None:
+        response = HttpResponse(status=401)
+    else:
+        user_id, valid_until = found
+        response = HttpResponse(status=200)
+        response[USER_HEADER] = user_id
+        response[EXPIRES_HEADER] = str(int(valid_until))
+        max_age = min(max_age, int(valid_until - time.time()))
+
+    # shared caches must key on the session cookie, Vary only tells them to
+    response["Cache-Control"] = f"max-age={max_age}" if max_age > 0 else "no-store"
+    response["Vary"] = "Cookie"
+    return response
+
+
+class WhoamiMiddleware:
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.path = None
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.path is None:
+            self.path = reverse("whoami")
+        if request.path == self.path:
+            return whoami(request)
+        return self.get_response(request)
@@ -0,0 +1,117 @@
+"""
+Compares adapter reads through model instances with the column projections.
+
+    python benchmarks/adapter.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+import uuid
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+import authjs.models as m  # noqa: E402
+from authjs import adapter  # noqa: E402
+from authjs.storage.orm import ORMStorage  # noqa: E402
+
+
+def model_session_and_user(session: adapter.Session) -> dict:
+    s = m.Session.objects.get(session_key=session["sessionToken"])
+    return {
+        "session": adapter.Session(
+            sessionToken=s.session_token,
+            userId=s.user.id,
+            expires=s.expires,
+        ),
+        "user": adapter.User(
+            id=s.user.id,
+            name=s.user.name,
+            email=s.user.email,
+            emailVerified=s.user.email_verified,
+            image=s.user.image,
+        ),
+    }
+
+
+def model_user(user: dict) -> adapter.User:
+    u = m.User.objects.get(pk=user["userId"])
+    return adapter.User(
+        id=u.id,
+        name=u.name,
+        email=u.email,
+        emailVerified=u.email_verified,
+        image=u.image,
+    )
+
+
+def peak_memory(fn: Callable[[], object], iterations: int) -> float:
+    """Average peak of memory allocated while a call runs."""
+    tracemalloc.start()
+    total = 0
+    for _ in range(iterations):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / iterations
+
+
+def bench(name: str, fn: Callable[[], object], iterations: int) -> None:
+    fn()
+    seconds = min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations
+    peak = peak_memory(fn, min(iterations, 500))
+    print(f"{name:<36}{seconds * 1e6:>10.1f} us/call{peak / 1024:>10.1f} KiB peak")  # noqa: T201
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    settings.DEBUG = False
+    connection.creation.create_test_db(verbosity=0)
+
+    adapter.create_user(
+        adapter.User(
+            id="bench",
+            email="bench@example.com",
+            name="bench",
+            emailVerified=timezone.now(),
+            image=None,
+        ),
+    )
+    session = adapter.create_session(
+        adapter.Session(
+            sessionToken=uuid.uuid4().hex,
+            userId="bench",
+            expires=timezone.now() + timedelta(days=1),
+        ),
+    )
+
+    storage = ORMStorage()
+    for name, fn in [
+        ("get_user (models)", lambda: model_user({"userId": "bench"})),
+        ("get_user (projection)", lambda: storage.get_user({"userId": "bench"})),
+        ("get_session_and_user (models)", lambda: model_session_and_user(session)),
+        (
+            "get_session_and_user (projection)",
+            lambda: storage.get_session_and_user(session),
+        ),
+    ]:
+        bench(name, fn, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares the database and jwt session strategies of the middleware, the
+shared-memory session cache and the `whoami` endpoint, uncached and
+micro-cached.
+
+    python benchmarks/middleware.py [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import timeit
+import uuid
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from authjs import adapter, jwe, middleware, whoami  # noqa: E402
+
+SECRET = "benchmark-secret"  # noqa: S105
+
+
+def authenticate(cookies: dict[str, str]) -> Callable[[], None]:
+    handler = middleware.AuthenticationMiddleware(lambda _: HttpResponse())
+    factory = RequestFactory()
+
+    def run() -> None:
+        request = factory.get("/")
+        request.COOKIES.update(cookies)
+        request.user = AnonymousUser()
+        handler(request)
+        assert request.user.is_authenticated  # noqa: S101
+
+    return run
+
+
+def check(cookies: dict[str, str]) -> Callable[[], None]:
+    factory = RequestFactory()
+
+    def run() -> None:
+        request = factory.get("/auth/whoami/")
+        request.COOKIES.update(cookies)
+        assert whoami.whoami(request).status_code == 200  # noqa: S101, PLR2004
+
+    return run
+
+
+def bench(name: str, run: Callable[[], None], iterations: int) -> None:
+    run()
+    with CaptureQueriesContext(connection) as queries:
+        run()
+
+    seconds = min(timeit.repeat(run, number=iterations, repeat=5)) / iterations
+    print(f"{name:<16}{seconds * 1e6:>10.1f} us/request{len(queries):>6} queries")  # noqa: T201
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    settings.DEBUG = False
+    connection.creation.create_test_db(verbosity=0)
+
+    adapter.create_user(
+        adapter.User(
+            id="bench",
+            email="bench@example.com",
+            name="bench",
+            emailVerified=None,
+            image=None,
+        ),
+    )
+    session = adapter.create_session(
+        adapter.Session(
+            sessionToken=uuid.uuid4().hex,
+            userId="bench",
+            expires=timezone.now() + timedelta(days=1),
+        ),
+    )
+    token = jwe.encode({"sub": "bench", "exp": int(time.time()) + 3600}, SECRET, middleware.TOKEN)
+
+    cookies = {middleware.TOKEN: session["sessionToken"]}
+    bench("database", authenticate(cookies), iterations)
+    with (
+        tempfile.TemporaryDirectory() as directory,
+        override_settings(AUTHJS_SHARED_SESSION_CACHE=f"{directory}/sessions"),
+    ):
+        bench("database (shm)", authenticate(cookies), iterations)
+    with override_settings(
+        AUTHJS_SESSION_STRATEGY="jwt",
+        AUTHJS_SECRET=SECRET,
+        AUTHJS_USER_CACHE="default",
+    ):
+        bench("jwt", authenticate({middleware.TOKEN: token}), iterations)
+
+    bench("whoami", check(cookies), iterations)
+    with override_settings(AUTHJS_WHOAMI_CACHE="default"):
+        bench("whoami (cached)", check(cookies), iterations)
+
+
+if __name__ == "__main__":
+    main()
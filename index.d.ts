@@ -4,6 +4,13 @@ import type { Adapter } from "@auth/core/adapters";
  * Adapter for django-authjs.
  *
  * @param url - Backend server auth endpoint.
+ * @param options.msgpack - Request MessagePack responses, requires `@msgpack/msgpack`.
+ * @param options.tracing - Propagate the active trace context, requires `@opentelemetry/api`.
+ * @param options.retries - Retries of create requests, made safe by idempotency keys
+ *     when `AUTHJS_IDEMPOTENCY_CACHE` is configured.
  * @returns Auth.js adapter
  */
-export function DjangoAdapter(url: string | URL): Adapter;
+export function DjangoAdapter(
+    url: string | URL,
+    options?: { msgpack?: boolean; tracing?: boolean; retries?: number },
+): Adapter;
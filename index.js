@@ -1,12 +1,67 @@
 /**
- * Creates a function that sends a request to the specified URL with the given method and parameters.
+ * Maximum number of response bodies kept for conditional requests.
+ */
+const ETAG_CACHE_SIZE = 1000
+
+/**
+ * Media type of the optional MessagePack encoding.
+ */
+const MSGPACK = "application/msgpack"
+
+/**
+ * Decodes a response body according to its content type.
+ *
+ * @param {Response} res
+ * @param {typeof import("@msgpack/msgpack") | null} msgpack
+ * @returns {Promise<any>}
+ */
+async function decode(res, msgpack) {
+    if (msgpack && res.headers.get("Content-Type") === MSGPACK)
+        return msgpack.decode(new Uint8Array(await res.arrayBuffer()))
+
+    return res.json()
+}
+
+/**
+ * Sends a request, retrying network errors, server errors and conflicts with exponential backoff.
+ *
+ * @param {URL} uri
+ * @param {RequestInit} init
+ * @param {number} retries
+ * @returns {Promise<Response>}
+ */
+async function send(uri, init, retries) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const res = await fetch(uri, init)
+            if (attempt >= retries || (res.status < 500 && res.status !== 409))
+                return res
+        } catch (err) {
+            if (attempt >= retries)
+                throw err
+        }
+
+        await new Promise(resolve => setTimeout(resolve, 100 * 2 ** attempt))
+    }
+}
+
+/**
+ * Creates a function that sends a request to the specified URL with the given method and parameters
+ * and resolves to the decoded response body.
+ * When an ETag cache is given, responses carrying an ETag are remembered and
+ * revalidated with If-None-Match, a 304 replays the remembered body.
  *
  * @template P {Record<string, any>}
  * @param {string | URL} url
  * @param {"POST" | "GET" | "PUT" | "DELETE"} method
- * @returns {function(string, P): Promise<Response>}
+ * @param {Object} [options]
+ * @param {Map<string, { etag: string, body: any }>} [options.etags]
+ * @param {Promise<typeof import("@msgpack/msgpack")> | null} [options.msgpack]
+ * @param {Promise<typeof import("@opentelemetry/api")> | null} [options.tracing]
+ * @param {number} [options.retries] - Retries with an Idempotency-Key on network errors, 5xx and 409.
+ * @returns {function(string, P): Promise<any>}
  */
-function request(url, method) {
+function request(url, method, { etags, msgpack, tracing, retries = 0 } = {}) {
     return async function (pathname, params) {
         const uri = new URL(url)
 
@@ -23,33 +78,66 @@ function request(url, method) {
 
         uri.pathname += pathname
 
-        const res = await fetch(uri, { method })
+        const decoder = msgpack ? await msgpack : null
+        const key = uri.toString()
+        const cached = etags?.get(key)
+        const headers = {}
+
+        if (decoder)
+            headers["Accept"] = `${MSGPACK}, application/json;q=0.9`
 
-        if (res.status !== 200) {
-            const { errors } = await res.json()
-            throw errors
+        if (cached)
+            headers["If-None-Match"] = cached.etag
+
+        if (tracing) {
+            const { context, propagation } = await tracing
+            propagation.inject(context.active(), headers)
         }
 
-        return res
+        if (retries > 0)
+            headers["Idempotency-Key"] = crypto.randomUUID()
+
+        const res = await send(uri, { method, headers }, retries)
+
+        if (cached && res.status === 304)
+            return cached.body
+
+        const body = await decode(res, decoder)
+
+        if (res.status !== 200)
+            throw body.errors
+
+        if (etags) {
+            etags.delete(key)
+            const etag = res.headers.get("ETag")
+            if (etag) {
+                etags.set(key, { etag, body })
+                if (etags.size > ETAG_CACHE_SIZE)
+                    etags.delete(etags.keys().next().value)
+            }
+        }
+
+        return body
     }
 }
 
 /**
  * Converts string date fields to JavaScript Date objects.
+ * MessagePack responses already carry Date objects and are returned as is.
  *
  * @param {Object} record - The record object potentially containing date strings.
- * @param {string} [record.emailVerified]
- * @param {string} [record.expires]
+ * @param {string | Date} [record.emailVerified]
+ * @param {string | Date} [record.expires]
  * @returns {Object}
  */
 function date(record) {
     const { emailVerified, expires } = record
 
-    if (emailVerified) {
+    if (typeof emailVerified === "string") {
         return { ...record, emailVerified: new Date(emailVerified) }
     }
 
-    if (expires) {
+    if (typeof expires === "string") {
         return { ...record, expires: new Date(expires) }
     }
 
@@ -60,72 +148,81 @@ function date(record) {
  * Adapter for django-authjs.
  *
  * @param {string | URL} url - Backend server auth endpoint.
+ * @param {Object} [options]
+ * @param {boolean} [options.msgpack] - Request MessagePack responses, requires `@msgpack/msgpack`.
+ * @param {boolean} [options.tracing] - Propagate the active trace context, requires `@opentelemetry/api`.
+ * @param {number} [options.retries] - Retries of create requests, made safe by idempotency keys
+ *     when `AUTHJS_IDEMPOTENCY_CACHE` is configured.
  * @returns {import("@auth/core/adapters").Adapter} Auth.js adapter
  */
-export function DjangoAdapter(url) {
-    const get = request(url, "GET")
-    const post = request(url, "POST")
-    const put = request(url, "PUT")
-    const del = request(url, "DELETE")
+export function DjangoAdapter(url, { msgpack = false, tracing = false, retries = 0 } = {}) {
+    const options = {
+        msgpack: msgpack ? import("@msgpack/msgpack") : null,
+        tracing: tracing ? import("@opentelemetry/api") : null,
+    }
+    const get = request(url, "GET", { ...options, etags: new Map() })
+    const post = request(url, "POST", { ...options, retries })
+    const put = request(url, "PUT", options)
+    const del = request(url, "DELETE", options)
 
     return {
         createUser: user => post(`create-user/`, user)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not create user", err)
             }),
 
         getUser: userId => get(`get-user/`, { userId })
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not get user", err)
                 return null
             }),
 
         getUserByAccount: acc => get(`get-user-by-email/`, acc)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not get user by email", err)
                 return null
             }),
 
         updateUser: user => put(`update-user/`, user)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not update user", err)
                 return null
             }),
 
         linkAccount: account => post(`link-account/`, account)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not link account", err)
                 return null
             }),
 
         deleteUser: userId => del(`delete-user/`, { userId })
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not delete user", err)
                 return null
             }),
 
         unlinkAccount: acc => del(`unlink-account/`, acc)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not delete user", err)
                 return null
             }),
 
         createSession: session => post(`create-session/`, session)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not link account", err)
                 return null
             }),
 
         getSessionAndUser: sessionToken => get(`get-session-and-user/`, { sessionToken })
-            .then(res => res.json()).then(({ session, user }) => ({
+            .then(({ session, user }) => ({
                 session: date(session),
                 user: date(user),
             }))
@@ -135,35 +232,35 @@ export function DjangoAdapter(url) {
             }),
 
         updateSession: session => put(`update-session/`, session)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not update session", err)
                 return null
             }),
 
         deleteSession: sessionToken => del(`delete-session/`, { sessionToken })
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not update session", err)
                 return null
             }),
 
         getUserByEmail: email => get(`get-user-by-email/`, { email })
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not get user by email", err)
                 return null
             }),
 
         createVerificationToken: token => post(`create-verification-token/`, token)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not create verification token", err)
                 return null
             }),
 
         useVerificationToken: token => del(`use-verification-token/`, token)
-            .then(res => res.json()).then(date)
+            .then(date)
             .catch(err => {
                 console.error("could not use verification token", err)
                 return null